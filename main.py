@@ -1,33 +1,182 @@
-from fastapi import FastAPI, Query
+from fastapi import Depends, FastAPI, Query, Request, Response
 from fastapi.responses import JSONResponse
 import os
 import random
 import re
 import hashlib
+import io
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from threading import Lock
 from datetime import datetime, timedelta, timezone
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+
+import ahocorasick
+import anyio.to_thread
+import httpx
+import orjson
+from cachetools import TTLCache
+
+# Se importan una vez al arrancar; si faltan, los endpoints devuelven el error
+# de dependencia en vez de romper el import de la app.
+try:
+    from supabase import create_client, ClientOptions
+except ImportError:
+    create_client = ClientOptions = None
+
+try:
+    import feedparser
+except ImportError:
+    feedparser = None
+
+# Los endpoints son sync (supabase-py es bloqueante) y FastAPI los corre en el
+# threadpool de anyio, que por defecto tiene 40 hilos: con más requests
+# concurrentes esperando a Supabase el resto queda en cola.
+THREADPOOL_SIZE = 100
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # Valida env vars y crea el cliente Supabase una vez, fuera del camino de los
+    # requests. Si falla, la app igual levanta (/health) y los endpoints devuelven el error.
+    get_sb()
+    yield
+
+class OrjsonResponse(JSONResponse):
+    """
+    JSON con orjson (bastante más rápido que el json de la stdlib).
+    Los endpoints que devuelven listas de mentions la retornan directo, así
+    FastAPI tampoco pasa cada fila por jsonable_encoder.
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
 
-app = FastAPI(title="Radar Backend", version="0.5")
+app = FastAPI(title="Radar Backend", version="0.5", lifespan=lifespan, default_response_class=OrjsonResponse)
 
 # =========================
 # DEMO CONFIG (seed)
 # =========================
 TOPICS = ["seguridad", "obras", "basura", "tráfico", "agua", "impuestos", "parques", "empleo"]
 SENTIMENTS = ["pos", "neu", "neg"]
+SEED_SENTIMENT_WEIGHTS = [30, 35, 35]
+SEED_SCORE_RANGES = {"pos": range(55, 96), "neu": range(35, 76), "neg": range(10, 61)}
+SEED_MINUTES = range(0, 24 * 60 + 1)
+SEED_AUTHOR_IDS = range(1000, 10000)
+
+# =========================
+# CACHE (respuestas en memoria)
+# =========================
+# /trending y /search son estables por unos segundos/minutos: repetir la misma
+# consulta no vuelve a Supabase ni rehace el resumen.
+_trend_cache: TTLCache = TTLCache(maxsize=512, ttl=60)
+SEARCH_CACHE_TTL_S = 30
+# /search acota por bytes (tamaño del JSON), no por cantidad de entradas: con
+# limit=500 y todas las columnas una sola respuesta pesa ~2 MB.
+SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+def _entry_size(entry: Tuple[Dict[str, Any], str]) -> int:
+    return len(orjson.dumps(entry[0]))
+
+_search_cache: TTLCache = TTLCache(maxsize=SEARCH_CACHE_MAX_BYTES, ttl=SEARCH_CACHE_TTL_S, getsizeof=_entry_size)
+# Lo mismo para CDN/navegador: pueden reusar la respuesta de /search mientras
+# dura el cache del server y servirla "stale" un rato más mientras revalidan.
+SEARCH_CACHE_CONTROL = f"public, max-age={SEARCH_CACHE_TTL_S}, stale-while-revalidate=60"
+_cache_lock = Lock()
+
+def cache_get(cache: TTLCache, key: tuple) -> Optional[Tuple[Dict[str, Any], str]]:
+    with _cache_lock:
+        return cache.get(key)
+
+def cache_set(cache: TTLCache, key: tuple, value: Tuple[Dict[str, Any], str]) -> None:
+    with _cache_lock:
+        try:
+            cache[key] = value
+        except ValueError:
+            # más grande que todo el cache: se responde sin cachear
+            pass
+
+# ETag: las entradas del cache guardan (payload, etag) para que un cliente que
+# repite la consulta (dashboards con polling) reciba 304 sin cuerpo.
+def make_etag(*parts: Any) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        h.update(orjson.dumps(p, default=str, option=orjson.OPT_SORT_KEYS))
+    return f'"{h.hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tags = [t.strip() for t in inm.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def cached_search_response(request: Request, cached: Tuple[Dict[str, Any], str], query: str) -> Response:
+    """
+    Respuesta de /search y /search/summary a partir de la entrada del cache:
+    ETag + Cache-Control, o 304 si el cliente ya la tiene.
+    El cache es por query.lower(): el etag incluye la query tal cual se devuelve.
+    """
+    out, out_etag = cached
+    etag = make_etag(out_etag, query)
+    headers = {"ETag": etag, "Cache-Control": SEARCH_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return OrjsonResponse({**out, "query": query}, headers=headers)
 
 # =========================
 # SUPABASE
 # =========================
+# Un solo cliente por proceso: reusa las conexiones HTTPS (keep-alive) a PostgREST
+# en vez de hacer handshake TCP/TLS en cada request.
+SB_MAX_KEEPALIVE = 20
+SB_MAX_CONNECTIONS = THREADPOOL_SIZE
+SB_TIMEOUT_S = 30
+
+_sb_client = None
+_sb_lock = Lock()
+
 def get_sb():
-    from supabase import create_client
+    global _sb_client
+    if _sb_client is not None:
+        return _sb_client, None
+
+    if create_client is None:
+        return None, "Missing dependency supabase. Add it to requirements.txt"
     url = (os.environ.get("SUPABASE_URL") or "").strip()
     key = (os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
     if not url or not key:
         return None, "Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY"
-    try:
-        return create_client(url, key), None
-    except Exception as e:
-        return None, str(e)
+    with _sb_lock:
+        if _sb_client is None:
+            try:
+                http = httpx.Client(
+                    timeout=SB_TIMEOUT_S,
+                    limits=httpx.Limits(max_keepalive_connections=SB_MAX_KEEPALIVE, max_connections=SB_MAX_CONNECTIONS),
+                )
+                _sb_client = create_client(url, key, ClientOptions(httpx_client=http))
+            except Exception as e:
+                return None, str(e)
+    return _sb_client, None
+
+class SupabaseUnavailable(Exception):
+    pass
+
+@app.exception_handler(SupabaseUnavailable)
+async def supabase_unavailable_handler(request: Request, exc: SupabaseUnavailable):
+    return JSONResponse(status_code=500, content={"error": str(exc)})
+
+async def require_sb():
+    """
+    Dependencia de los endpoints: el cliente ya se creó al arrancar (lifespan),
+    acá solo se lee. async para no pasar por el threadpool en cada request.
+    """
+    sb, err = get_sb()
+    if err:
+        raise SupabaseUnavailable(err)
+    return sb
 
 # =========================
 # HELPERS
@@ -38,6 +187,15 @@ def utc_now() -> datetime:
 def iso(dt: datetime) -> str:
     return dt.astimezone(timezone.utc).isoformat()
 
+# Cutoff "ahora - ventana" redondeado (por defecto al minuto) y memoizado: dentro
+# del mismo bucket todas las requests con la misma ventana reusan el mismo string.
+@lru_cache(maxsize=64)
+def _cutoff(delta: timedelta, bucket_s: int, bucket: int) -> str:
+    return iso(datetime.fromtimestamp(bucket * bucket_s, timezone.utc) - delta)
+
+def cutoff(delta: timedelta, bucket_s: int = 60) -> str:
+    return _cutoff(delta, bucket_s, int(time.time() // bucket_s))
+
 def clamp_int(x: int, lo: int, hi: int) -> int:
     return max(lo, min(hi, x))
 
@@ -47,12 +205,40 @@ def safe_strip(s: Optional[str]) -> Optional[str]:
     s2 = s.strip()
     return s2 if s2 else None
 
+def summary_from_counts(counts: Dict[str, int], score_sum: float) -> Dict[str, Any]:
+    """
+    total, counts y % por sentiment, avg_score a partir de los conteos.
+    """
+    total = sum(counts.values())
+    percentages = {k: (round((v / total) * 100, 2) if total else 0.0) for k, v in counts.items()}
+    avg_score = round((score_sum / total), 2) if total else 0.0
+    return {
+        "total": total,
+        "sentiment_counts": counts,
+        "sentiment_percentages": percentages,
+        "avg_score": avg_score,
+    }
+
+def sentiment_summary(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Resumen de una lista de mentions (ver summary_from_counts).
+    Sentiment vacío o desconocido cuenta como "neu".
+    """
+    seen = Counter(it.get("sentiment") for it in items)
+    counts = {k: seen.get(k, 0) for k in SENTIMENTS}
+    counts["neu"] += len(items) - sum(counts.values())
+    score_sum = sum(it["score"] for it in items)
+    return summary_from_counts(counts, score_sum)
+
+_WINDOW_RE = re.compile(r"^(\d+)\s*([hd])$")
+
+@lru_cache(maxsize=32)
 def parse_window(window: str) -> timedelta:
     """
     window examples: "1h", "6h", "24h", "7d"
     """
     window = (window or "24h").strip().lower()
-    m = re.match(r"^(\d+)\s*([hd])$", window)
+    m = _WINDOW_RE.match(window)
     if not m:
         return timedelta(hours=24)
     n = int(m.group(1))
@@ -61,52 +247,131 @@ def parse_window(window: str) -> timedelta:
         return timedelta(hours=n)
     return timedelta(days=n)
 
-def classify_sentiment_simple(text: str) -> str:
+# Keywords (MVP). Se compilan una sola vez en un autómata Aho-Corasick:
+# un solo recorrido del texto encuentra todas las keywords de sentiment y topic.
+POS_WORDS = ["mejor", "avance", "inaugura", "beneficio", "logro", "soluciona", "reduce", "aumenta", "éxito"]
+NEG_WORDS = ["crisis", "denuncia", "protesta", "muere", "violencia", "asalt", "robo", "corrup", "caos", "colaps"]
+TOPIC_RULES = [
+    ("seguridad", ["seguridad", "asalto", "robo", "homicidio", "sicariato", "delinc"]),
+    ("obras", ["obra", "puente", "vía", "carretera", "construcción", "asfalto"]),
+    ("basura", ["basura", "desechos", "recolección", "relleno", "contaminación"]),
+    ("tráfico", ["tráfico", "congestión", "choque", "accidente", "movilidad"]),
+    ("agua", ["agua", "potable", "corte", "tubería", "alcantarillado"]),
+    ("impuestos", ["impuesto", "tasa", "tribut", "sri", "predial"]),
+    ("parques", ["parque", "área verde", "recreación", "malecon", "malecón"]),
+    ("empleo", ["empleo", "trabajo", "desempleo", "contrat", "vacantes"]),
+]
+
+def _build_keyword_automaton() -> ahocorasick.Automaton:
     """
-    MVP: heurística simple (luego lo cambiamos por modelo real).
+    Cada keyword guarda sus tags: ("sent", +1/-1) y/o ("topic", índice en TOPIC_RULES).
+    Una keyword puede tener varios (ej. "robo" es negativa y de seguridad).
+    """
+    tags: Dict[str, List[tuple]] = {}
+    for w in POS_WORDS:
+        tags.setdefault(w, []).append(("sent", 1))
+    for w in NEG_WORDS:
+        tags.setdefault(w, []).append(("sent", -1))
+    for i, (_, kws) in enumerate(TOPIC_RULES):
+        for k in kws:
+            tags.setdefault(k, []).append(("topic", i))
+
+    ac = ahocorasick.Automaton()
+    for kw, kw_tags in tags.items():
+        ac.add_word(kw, (kw, tuple(kw_tags)))
+    ac.make_automaton()
+    return ac
+
+_KEYWORDS_AC = _build_keyword_automaton()
+
+def keyword_hits(text: str) -> Dict[str, tuple]:
+    """
+    Keywords presentes en el texto (cada una una sola vez) -> sus tags.
     """
     t = (text or "").lower()
-    pos_words = ["mejor", "avance", "inaugura", "beneficio", "logro", "soluciona", "reduce", "aumenta", "éxito"]
-    neg_words = ["crisis", "denuncia", "protesta", "muere", "violencia", "asalt", "robo", "corrup", "caos", "colaps"]
+    return dict(v for _, v in _KEYWORDS_AC.iter(t))
+
+def classify_text(text: str) -> Tuple[str, str]:
+    """
+    (sentiment, topic) con un solo recorrido del texto por el autómata.
+    """
     score = 0
-    for w in pos_words:
-        if w in t:
-            score += 1
-    for w in neg_words:
-        if w in t:
-            score -= 1
+    best_topic = None
+    for kw_tags in keyword_hits(text).values():
+        for kind, val in kw_tags:
+            if kind == "sent":
+                score += val
+            elif best_topic is None or val < best_topic:
+                best_topic = val
+
     if score >= 1:
-        return "pos"
-    if score <= -1:
-        return "neg"
-    return "neu"
+        sentiment = "pos"
+    elif score <= -1:
+        sentiment = "neg"
+    else:
+        sentiment = "neu"
+    topic = TOPIC_RULES[best_topic][0] if best_topic is not None else "otros"
+    return sentiment, topic
+
+def classify_sentiment_simple(text: str) -> str:
+    """
+    MVP: heurística simple (luego lo cambiamos por modelo real).
+    """
+    return classify_text(text)[0]
 
 def topic_from_text_simple(text: str) -> str:
     """
-    MVP: detecta topic por keywords.
+    MVP: detecta topic por keywords (gana el primero en TOPIC_RULES).
     """
-    t = (text or "").lower()
-    rules = [
-        ("seguridad", ["seguridad", "asalto", "robo", "homicidio", "sicariato", "delinc"]),
-        ("obras", ["obra", "puente", "vía", "carretera", "construcción", "asfalto"]),
-        ("basura", ["basura", "desechos", "recolección", "relleno", "contaminación"]),
-        ("tráfico", ["tráfico", "congestión", "choque", "accidente", "movilidad"]),
-        ("agua", ["agua", "potable", "corte", "tubería", "alcantarillado"]),
-        ("impuestos", ["impuesto", "tasa", "tribut", "sri", "predial"]),
-        ("parques", ["parque", "área verde", "recreación", "malecon", "malecón"]),
-        ("empleo", ["empleo", "trabajo", "desempleo", "contrat", "vacantes"]),
-    ]
-    for topic, kws in rules:
-        if any(k in t for k in kws):
-            return topic
-    return "otros"
+    return classify_text(text)[1]
 
 def stable_id_from_url(url: str) -> str:
     """
     Genera un hash corto para deduplicar noticias por URL.
     """
-    h = hashlib.sha256((url or "").encode("utf-8")).hexdigest()
-    return h[:24]
+    # blake2b de 12 bytes: mismo largo (24 hex) y más rápido que sha256 truncado
+    return hashlib.blake2b((url or "").encode("utf-8"), digest_size=12).hexdigest()
+
+# =========================
+# TEXT SEARCH (full-text + substring)
+# =========================
+def text_search(
+    sb,
+    q: str,
+    since: Optional[str] = None,
+    filters: Optional[Dict[str, Optional[str]]] = None,
+    limit: int = 50,
+    columns: str = "*",
+    count: Optional[str] = None,
+):
+    """
+    Mentions que matchean "q" (más recientes primero). Devuelve la respuesta
+    de Supabase (.data y, si se pidió count="exact", .count).
+    La regla (full-text primero, substring con pg_trgm si no hay resultados o
+    "q" trae comodines) vive en la RPC search_mentions_hits, la misma que usa /search.
+    "filters" son igualdades por columna; los valores None se ignoran.
+    """
+    params = {"q": q, "since": since, **{f"p_{col}": val for col, val in (filters or {}).items()}}
+    query = sb.rpc("search_mentions_hits", params, count=count).select(columns)
+    return query.order("created_at", desc=True).limit(limit).execute()
+
+# =========================
+# BULK INSERT
+# =========================
+# Igual al tope de /seed: un seed completo es un solo round-trip.
+INSERT_CHUNK = 1000
+
+def insert_mentions(sb, rows: List[Dict[str, Any]]) -> int:
+    """
+    Inserta en lotes de INSERT_CHUNK vía RPC bulk_insert_mentions
+    (un INSERT ... SELECT por lote, ON CONFLICT (url) DO NOTHING).
+    Devuelve cuántas filas se insertaron.
+    """
+    inserted = 0
+    for i in range(0, len(rows), INSERT_CHUNK):
+        res = sb.rpc("bulk_insert_mentions", {"payload": rows[i:i + INSERT_CHUNK]}).execute()
+        inserted += int(res.data or 0)
+    return inserted
 
 # =========================
 # HEALTH
@@ -125,42 +390,40 @@ def health():
 # DEMO SEED (para probar)
 # =========================
 @app.api_route("/seed", methods=["GET", "POST"])
-def seed(n: int = 120):
-    sb, err = get_sb()
-    if err:
-        return JSONResponse(status_code=500, content={"error": err})
-
+def seed(n: int = 120, sb=Depends(require_sb)):
     n = clamp_int(n, 1, 1000)
     now = utc_now()
-    rows = []
 
-    for _ in range(n):
-        created_at = now - timedelta(minutes=random.randint(0, 24 * 60))
-        sent = random.choices(SENTIMENTS, weights=[30, 35, 35], k=1)[0]
-        topic = random.choice(TOPICS)
-        score = random.randint(55, 95) if sent == "pos" else random.randint(35, 75) if sent == "neu" else random.randint(10, 60)
+    # Todo el azar se sortea de una vez (k=n) en vez de 4 llamadas por fila
+    sents = random.choices(SENTIMENTS, weights=SEED_SENTIMENT_WEIGHTS, k=n)
+    topics = random.choices(TOPICS, k=n)
+    minutes = random.choices(SEED_MINUTES, k=n)
+    authors = random.choices(SEED_AUTHOR_IDS, k=n)
 
-        rows.append({
-            "created_at": iso(created_at),
+    rows = [
+        {
+            "created_at": iso(now - timedelta(minutes=mins)),
             "source": "demo",
             "country": "EC",
             "city": "Guayaquil",
             "platform": "news",
             "target": "alcaldia_gye",
-            "author": f"user{random.randint(1000,9999)}",
+            "author": f"user{author}",
             "title": None,
             "text": f"Comentario {sent} sobre {topic} en Guayaquil (demo).",
             "url": None,
             "sentiment": sent,
-            "score": score,
+            "score": random.choice(SEED_SCORE_RANGES[sent]),
             "topic": topic,
             "lang": "es",
             "gender": None,
             "age_range": None,
-        })
+        }
+        for sent, topic, mins, author in zip(sents, topics, minutes, authors)
+    ]
 
-    sb.table("mentions").insert(rows).execute()
-    return {"inserted_mentions": n}
+    inserted = insert_mentions(sb, rows)
+    return {"inserted_mentions": inserted}
 
 # =========================
 # MENTIONS LIST (con filtros)
@@ -177,11 +440,8 @@ def get_mentions(
     platform: Optional[str] = None,
     target: Optional[str] = None,
     since_hours: Optional[int] = Query(None, ge=1, le=720),
+    sb=Depends(require_sb),
 ):
-    sb, err = get_sb()
-    if err:
-        return JSONResponse(status_code=500, content={"error": err})
-
     q = safe_strip(q)
     topic = safe_strip(topic)
     sentiment = safe_strip(sentiment)
@@ -191,39 +451,58 @@ def get_mentions(
     platform = safe_strip(platform)
     target = safe_strip(target)
 
-    query = sb.table("mentions").select("*").order("created_at", desc=True).limit(limit)
-
-    if since_hours:
-        since_dt = utc_now() - timedelta(hours=since_hours)
-        query = query.gte("created_at", iso(since_dt))
-
-    if topic:
-        query = query.eq("topic", topic)
-    if sentiment:
-        query = query.eq("sentiment", sentiment)
-    if source:
-        query = query.eq("source", source)
-    if country:
-        query = query.eq("country", country)
-    if city:
-        query = query.eq("city", city)
-    if platform:
-        query = query.eq("platform", platform)
-    if target:
-        query = query.eq("target", target)
-
-    # Para MVP, "q" filtra en topic o text o title usando ilike
+    since = cutoff(timedelta(hours=since_hours)) if since_hours else None
+
+    filters = {
+        "topic": topic,
+        "sentiment": sentiment,
+        "source": source,
+        "country": country,
+        "city": city,
+        "platform": platform,
+        "target": target,
+    }
+
+    # "q" filtra por texto en title/text (ver text_search)
     if q:
-        query = query.or_(f"text.ilike.%{q}%,title.ilike.%{q}%,topic.ilike.%{q}%")
+        return OrjsonResponse(text_search(sb, q, since, filters, limit).data)
 
-    res = query.execute()
-    return res.data
+    params = {f"p_{col}": val for col, val in filters.items()}
+    params["p_since"] = since
+    params["p_limit"] = limit
+    res = sb.rpc("list_mentions", params).execute()
+    return OrjsonResponse(res.data)
 
 # =========================
 # SEARCH (palabra/frase + resumen)
 # =========================
+MENTION_COLUMNS = (
+    "id", "created_at", "source", "country", "city", "platform", "target", "author", "title",
+    "text", "url", "sentiment", "score", "topic", "lang", "gender", "age_range",
+)
+# /search devuelve filas compactas (sin "text") salvo que se pida con fields=...
+SEARCH_DEFAULT_FIELDS = "id,created_at,title,url,sentiment,score,topic,target,source"
+SEARCH_ITEM_COLUMNS = "id,created_at,title,text,sentiment,score,topic"
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    "id,title,score" -> ["id", "title", "score"]; "*" -> None (todas las columnas).
+    ValueError si alguna columna no existe.
+    """
+    fields = (fields or "").strip()
+    if fields == "*":
+        return None
+    cols = [c.strip() for c in fields.split(",") if c.strip()]
+    if not cols:
+        raise ValueError("Empty fields")
+    unknown = [c for c in cols if c not in MENTION_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {','.join(unknown)}")
+    return cols
+
 @app.get("/search")
 def search(
+    request: Request,
     query: str = Query(..., min_length=1),
     limit: int = Query(50, ge=1, le=500),
     since_hours: Optional[int] = Query(24, ge=1, le=720),
@@ -231,137 +510,191 @@ def search(
     city: Optional[str] = None,
     platform: Optional[str] = None,
     source: Optional[str] = None,
+    fields: str = SEARCH_DEFAULT_FIELDS,
+    sb=Depends(require_sb),
 ):
-    sb, err = get_sb()
-    if err:
-        return JSONResponse(status_code=500, content={"error": err})
+    """
+    Resumen por sentiment + filas. "fields": columnas de cada fila ("*" = todas).
+    """
+    query = query.strip()
+    country = safe_strip(country)
+    city = safe_strip(city)
+    platform = safe_strip(platform)
+    source = safe_strip(source)
+    try:
+        cols = parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    cache_key = (query.lower(), limit, since_hours, country, city, platform, source, tuple(cols or ("*",)))
+    cached = cache_get(_search_cache, cache_key)
+    if cached is None:
+        # Resumen + filas en una sola RPC (conteos hechos en Postgres)
+        params = {
+            "q": query,
+            "since": cutoff(timedelta(hours=since_hours)) if since_hours else None,
+            "p_country": country,
+            "p_city": city,
+            "p_platform": platform,
+            "p_source": source,
+            "lim": limit,
+            "p_fields": cols,
+        }
+        agg = sb.rpc("search_mentions_agg", params).execute().data[0]
 
+        counts = {k: agg[k] for k in SENTIMENTS}
+        out = {"query": query, **summary_from_counts(counts, agg["score_sum"]), "items": agg["items"]}
+        cached = (out, make_etag(out))
+        cache_set(_search_cache, cache_key, cached)
+
+    return cached_search_response(request, cached, query)
+
+@app.get("/search/summary")
+def search_summary(
+    request: Request,
+    query: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=500),
+    since_hours: Optional[int] = Query(24, ge=1, le=720),
+    country: Optional[str] = None,
+    city: Optional[str] = None,
+    platform: Optional[str] = None,
+    source: Optional[str] = None,
+    sb=Depends(require_sb),
+):
+    """
+    Solo el resumen de /search: trae sentiment,score (no las filas completas).
+    "total_matches" es el conteo exacto en DB, sin el tope de "limit".
+    """
     query = query.strip()
     country = safe_strip(country)
     city = safe_strip(city)
     platform = safe_strip(platform)
     source = safe_strip(source)
 
-    q = sb.table("mentions").select("*").order("created_at", desc=True).limit(limit)
-
-    if since_hours:
-        since_dt = utc_now() - timedelta(hours=since_hours)
-        q = q.gte("created_at", iso(since_dt))
-
-    if country:
-        q = q.eq("country", country)
-    if city:
-        q = q.eq("city", city)
-    if platform:
-        q = q.eq("platform", platform)
-    if source:
-        q = q.eq("source", source)
-
-    q = q.or_(f"text.ilike.%{query}%,title.ilike.%{query}%,topic.ilike.%{query}%")
-    res = q.execute()
-    items = res.data or []
-
-    # resumen
-    counts = {"pos": 0, "neu": 0, "neg": 0}
-    total = len(items)
-    score_sum = 0.0
-    for it in items:
-        s = (it.get("sentiment") or "neu")
-        if s not in counts:
-            s = "neu"
-        counts[s] += 1
-        try:
-            score_sum += float(it.get("score") or 0)
-        except:
-            pass
+    cache_key = ("summary", query.lower(), limit, since_hours, country, city, platform, source)
+    cached = cache_get(_search_cache, cache_key)
+    if cached is None:
+        since = cutoff(timedelta(hours=since_hours)) if since_hours else None
+        filters = {"country": country, "city": city, "platform": platform, "source": source}
+        res = text_search(sb, query, since, filters, limit, columns="sentiment,score", count="exact")
 
-    percentages = {k: (round((v / total) * 100, 2) if total else 0.0) for k, v in counts.items()}
-    avg_score = round((score_sum / total), 2) if total else 0.0
+        out = {"query": query, **sentiment_summary(res.data or []), "total_matches": res.count}
+        cached = (out, make_etag(out))
+        cache_set(_search_cache, cache_key, cached)
 
-    return {
-        "query": query,
-        "total": total,
-        "sentiment_counts": counts,
-        "sentiment_percentages": percentages,
-        "avg_score": avg_score,
-        "items": items,
-    }
+    return cached_search_response(request, cached, query)
+
+@app.get("/search/items")
+def search_items(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=500),
+    since_hours: Optional[int] = Query(24, ge=1, le=720),
+    country: Optional[str] = None,
+    city: Optional[str] = None,
+    platform: Optional[str] = None,
+    source: Optional[str] = None,
+    fields: str = SEARCH_ITEM_COLUMNS,
+    sb=Depends(require_sb),
+):
+    """
+    Solo las filas de /search, con las columnas que usa el front ("fields").
+    """
+    query = query.strip()
+    country = safe_strip(country)
+    city = safe_strip(city)
+    platform = safe_strip(platform)
+    source = safe_strip(source)
+    try:
+        cols = parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    since = cutoff(timedelta(hours=since_hours)) if since_hours else None
+    filters = {"country": country, "city": city, "platform": platform, "source": source}
+    columns = ",".join(cols) if cols else "*"
+    items = text_search(sb, query, since, filters, limit, columns=columns).data or []
+    return OrjsonResponse({"query": query, "items": items})
 
 # =========================
 # TRENDING (automático)
 # =========================
+TRENDING_ROLLUP_MIN_WINDOW = timedelta(hours=24)
+TRENDING_ROLLUP_BUCKET_S = 3600
+
 @app.get("/trending")
 def trending(
+    request: Request,
     window: str = "24h",
     limit: int = Query(10, ge=1, le=50),
     country: Optional[str] = "EC",
     platform: Optional[str] = "news",
+    sb=Depends(require_sb),
 ):
     """
     Devuelve topics más mencionados en una ventana de tiempo.
+    Responde 304 si el cliente manda If-None-Match con el ETag vigente.
     """
-    sb, err = get_sb()
-    if err:
-        return JSONResponse(status_code=500, content={"error": err})
-
-    delta = parse_window(window)
-    since_dt = utc_now() - delta
-
-    q = sb.table("mentions").select("topic,sentiment,score,created_at").gte("created_at", iso(since_dt))
-
-    if country:
-        q = q.eq("country", country)
-    if platform:
-        q = q.eq("platform", platform)
-
-    res = q.execute()
-    items = res.data or []
-
-    # Agrupar por topic
-    agg: Dict[str, Dict[str, Any]] = {}
-    for it in items:
-        tp = (it.get("topic") or "otros").strip()
-        if not tp:
-            tp = "otros"
-        if tp not in agg:
-            agg[tp] = {"topic": tp, "count": 0, "pos": 0, "neu": 0, "neg": 0, "score_sum": 0.0}
-        agg[tp]["count"] += 1
-        s = it.get("sentiment") or "neu"
-        if s not in ("pos", "neu", "neg"):
-            s = "neu"
-        agg[tp][s] += 1
-        try:
-            agg[tp]["score_sum"] += float(it.get("score") or 0)
-        except:
-            pass
-
-    rows = list(agg.values())
-    for r in rows:
-        total = r["count"]
-        r["avg_score"] = round((r["score_sum"] / total), 2) if total else 0.0
-        r["sentiment_percentages"] = {
-            "pos": round((r["pos"] / total) * 100, 2) if total else 0.0,
-            "neu": round((r["neu"] / total) * 100, 2) if total else 0.0,
-            "neg": round((r["neg"] / total) * 100, 2) if total else 0.0,
+    cache_key = (window, limit, country, platform)
+    cached = cache_get(_trend_cache, cache_key)
+    if cached is None:
+        delta = parse_window(window)
+
+        # Agrupado por topic en Postgres, ordenado por volumen. Ventanas largas
+        # leen el rollup por hora (mentions_hourly) en vez de las mentions crudas;
+        # ahí "since" es el inicio del primer bucket, que es lo que se cuenta.
+        if delta >= TRENDING_ROLLUP_MIN_WINDOW:
+            fn, since = "trending_rollup", cutoff(delta, TRENDING_ROLLUP_BUCKET_S)
+        else:
+            fn, since = "trending", cutoff(delta)
+        params = {"window_start": since, "p_country": country or None, "p_platform": platform or None}
+        res = sb.rpc(fn, params).order("count", desc=True).limit(limit).execute()
+        rows = res.data or []
+
+        for r in rows:
+            summary = summary_from_counts({k: r[k] for k in SENTIMENTS}, r.pop("score_sum"))
+            r["avg_score"] = summary["avg_score"]
+            r["sentiment_percentages"] = summary["sentiment_percentages"]
+
+        out = {
+            "window": window,
+            "since": since,
+            "country": country,
+            "platform": platform,
+            "items": rows,
         }
-        # limpiar
-        del r["score_sum"]
-
-    # ordenar por volumen
-    rows.sort(key=lambda x: x["count"], reverse=True)
-    rows = rows[:limit]
+        # "since" avanza cada minuto: el etag sale de la consulta + items, así
+        # un dashboard que hace polling recibe 304 mientras el ranking no cambie.
+        cached = (out, make_etag(cache_key, rows))
+        cache_set(_trend_cache, cache_key, cached)
 
-    return {
-        "window": window,
-        "since": iso(since_dt),
-        "country": country,
-        "platform": platform,
-        "items": rows,
-    }
+    out, etag = cached
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return OrjsonResponse(out, headers={"ETag": etag})
 
 # =========================
 # INGEST: RSS -> mentions
 # =========================
+# Los feeds se descargan en paralelo (tiempo total ~ el feed más lento, no la suma),
+# con un cliente HTTP compartido para reusar conexiones entre llamadas.
+FEED_FETCH_WORKERS = 8
+FEED_TIMEOUT_S = 10
+FEED_SCHEMES = ("http://", "https://")
+_feed_http = httpx.Client(timeout=FEED_TIMEOUT_S, follow_redirects=True)
+
+def fetch_feed(feed_url: str) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Descarga un feed: (cuerpo, headers). Los headers van a feedparser para que
+    detecte el charset del Content-Type. Si falla devuelve b"" (feedparser lo
+    toma como feed vacío, igual que cuando parse(url) no podía conectarse).
+    """
+    try:
+        r = _feed_http.get(feed_url)
+        r.raise_for_status()
+        return r.content, dict(r.headers)
+    except httpx.HTTPError:
+        return b"", {}
+
 @app.post("/ingest/rss")
 def ingest_rss(
     feeds: Optional[List[str]] = None,
@@ -369,6 +702,7 @@ def ingest_rss(
     country: str = "EC",
     city: Optional[str] = None,
     limit_per_feed: int = Query(20, ge=1, le=50),
+    sb=Depends(require_sb),
 ):
     """
     Ingresa noticias desde RSS.
@@ -376,13 +710,7 @@ def ingest_rss(
     - Guarda en mentions como platform='news' y source='rss'
     - Dedup por url (si url existe)
     """
-    sb, err = get_sb()
-    if err:
-        return JSONResponse(status_code=500, content={"error": err})
-
-    try:
-        import feedparser
-    except Exception:
+    if feedparser is None:
         return JSONResponse(
             status_code=500,
             content={"error": "Missing dependency feedparser. Add it to requirements.txt"},
@@ -398,12 +726,22 @@ def ingest_rss(
 
     feeds = feeds or default_feeds
 
+    # Solo URLs http(s): feedparser también leería rutas locales del servidor
+    invalid = [f for f in feeds if not f.lower().startswith(FEED_SCHEMES)]
+    if invalid:
+        return JSONResponse(status_code=400, content={"error": f"Invalid feed urls: {', '.join(invalid)}"})
+
     inserted = 0
     skipped = 0
     rows = []
+    seen_urls = set()
+
+    with ThreadPoolExecutor(max_workers=min(len(feeds), FEED_FETCH_WORKERS)) as pool:
+        bodies = list(pool.map(fetch_feed, feeds))
 
-    for feed_url in feeds:
-        parsed = feedparser.parse(feed_url)
+    for body, headers in bodies:
+        # BytesIO: con bytes/str feedparser primero intenta abrirlos como ruta local
+        parsed = feedparser.parse(io.BytesIO(body), response_headers=headers)
         entries = parsed.entries[:limit_per_feed]
 
         for e in entries:
@@ -423,20 +761,14 @@ def ingest_rss(
                 skipped += 1
                 continue
 
-            sentiment = classify_sentiment_simple(text_blob)
-            topic = topic_from_text_simple(text_blob)
+            sentiment, topic = classify_text(text_blob)
 
-            # Dedup: si hay URL, evitamos reinsertar la misma
-            # (MVP: hacemos una consulta rápida por url exacta)
+            # Dedup dentro del mismo lote (la misma noticia en varios feeds)
             if link:
-                try:
-                    exists = sb.table("mentions").select("id").eq("url", link).limit(1).execute().data
-                    if exists:
-                        skipped += 1
-                        continue
-                except:
-                    # si falla la consulta por cualquier razón, igual intenta insertar
-                    pass
+                if link in seen_urls:
+                    skipped += 1
+                    continue
+                seen_urls.add(link)
 
             rows.append({
                 "created_at": iso(dt),
@@ -457,9 +789,11 @@ def ingest_rss(
                 "age_range": None,
             })
 
+    # Dedup contra la DB: índice único en url + ON CONFLICT DO NOTHING,
+    # las que ya existen simplemente no se insertan (sin SELECT previo)
     if rows:
-        sb.table("mentions").insert(rows).execute()
-        inserted = len(rows)
+        inserted = insert_mentions(sb, rows)
+        skipped += len(rows) - inserted
 
     return {
         "feeds_used": len(feeds),
@@ -472,10 +806,7 @@ def ingest_rss(
 # QUICK TEST (opcional)
 # =========================
 @app.get("/test_table")
-def test_table():
-    sb, err = get_sb()
-    if err:
-        return JSONResponse(status_code=500, content={"error": err})
+def test_table(sb=Depends(require_sb)):
     res = sb.table("test_table").select("*").limit(50).execute()
     return res.data
 
@@ -0,0 +1,23 @@
+-- Búsqueda full-text sobre mentions (title + text) con índice GIN.
+--
+-- Usamos un índice de expresión en vez de una columna generada `tsv`
+-- para que `select *` en la API no devuelva el tsvector.
+
+create index if not exists mentions_tsv_gin
+    on mentions
+    using gin (to_tsvector('spanish', coalesce(title, '') || ' ' || coalesce(text, '')));
+
+-- RPC para /search y /mentions?q=...
+-- Es LANGUAGE sql STABLE para que Postgres la "inline" y los filtros/orden/limit
+-- que agrega PostgREST (eq, order, limit) se apliquen dentro del mismo plan.
+create or replace function search_mentions(q text, since timestamptz default null)
+returns setof mentions
+language sql
+stable
+as $$
+    select m.*
+    from mentions m
+    where to_tsvector('spanish', coalesce(m.title, '') || ' ' || coalesce(m.text, ''))
+          @@ plainto_tsquery('spanish', q)
+      and (since is null or m.created_at >= since)
+$$;
@@ -0,0 +1,26 @@
+-- Búsqueda por substring (tokens parciales: "segur", "guaya") con pg_trgm.
+--
+-- Los índices son sobre lower(col): el planner solo los usa si el filtro
+-- también es lower(col) LIKE ..., por eso la RPC compara contra lower().
+
+create extension if not exists pg_trgm;
+
+create index if not exists mentions_text_trgm
+    on mentions
+    using gin (lower(text) gin_trgm_ops);
+
+create index if not exists mentions_title_trgm
+    on mentions
+    using gin (lower(title) gin_trgm_ops);
+
+-- "q" llega ya en minúsculas desde la API; puede traer comodines de LIKE (% _).
+create or replace function search_mentions_substring(q text, since timestamptz default null)
+returns setof mentions
+language sql
+stable
+as $$
+    select m.*
+    from mentions m
+    where (lower(m.text) like '%' || q || '%' or lower(m.title) like '%' || q || '%')
+      and (since is null or m.created_at >= since)
+$$;
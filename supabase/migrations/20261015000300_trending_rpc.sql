@@ -0,0 +1,31 @@
+-- /trending: agregación por topic dentro de Postgres.
+-- La API recibe K filas (una por topic) en vez de todas las mentions de la ventana.
+
+create index if not exists mentions_country_platform_created_at
+    on mentions (country, platform, created_at desc)
+    include (topic, sentiment, score);
+
+-- Mismas reglas que el agrupado que hacía la API:
+-- topic vacío/null -> 'otros', sentiment desconocido/null -> 'neu', score null -> 0.
+create or replace function trending(
+    window_start timestamptz,
+    p_country text default null,
+    p_platform text default null
+)
+returns table (topic text, count int, pos int, neu int, neg int, score_sum float8)
+language sql
+stable
+as $$
+    select
+        coalesce(nullif(trim(m.topic), ''), 'otros') as topic,
+        count(*)::int as count,
+        (count(*) filter (where m.sentiment = 'pos'))::int as pos,
+        (count(*) filter (where m.sentiment is null or m.sentiment not in ('pos', 'neg')))::int as neu,
+        (count(*) filter (where m.sentiment = 'neg'))::int as neg,
+        coalesce(sum(m.score), 0)::float8 as score_sum
+    from mentions m
+    where m.created_at >= window_start
+      and (p_country is null or m.country = p_country)
+      and (p_platform is null or m.platform = p_platform)
+    group by 1
+$$;
@@ -0,0 +1,18 @@
+-- Dedup de noticias por url en la DB: /ingest/rss inserta con
+-- ON CONFLICT (url) WHERE url IS NOT NULL DO NOTHING (RPC bulk_insert_mentions)
+-- en vez de consultar antes.
+--
+-- Parcial: las mentions sin url (seed, otras plataformas) no entran al índice.
+
+-- limpiar duplicados previos: por url se queda la fila más antigua
+-- (created_at; id solo desempata, no se asume que crezca con el tiempo)
+delete from mentions m
+using (
+    select id, row_number() over (partition by url order by created_at nulls last, id) as rn
+    from mentions
+    where url is not null
+) d
+where m.id = d.id
+  and d.rn > 1;
+
+create unique index if not exists mentions_url_uq on mentions (url) where url is not null;
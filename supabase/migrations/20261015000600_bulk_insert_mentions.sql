@@ -0,0 +1,30 @@
+-- Inserción masiva de mentions en una sola sentencia por lote
+-- (INSERT ... SELECT desde el JSON, sin que PostgREST arme fila por fila).
+-- Dedup por url: ON CONFLICT (url) WHERE url IS NOT NULL DO NOTHING
+-- (el predicado es el del índice parcial mentions_url_uq).
+-- Devuelve cuántas filas se insertaron realmente.
+
+create or replace function bulk_insert_mentions(payload jsonb)
+returns int
+language plpgsql
+as $$
+declare
+    inserted int;
+begin
+    insert into mentions (
+        created_at, source, country, city, platform, target, author, title, text,
+        url, sentiment, score, topic, lang, gender, age_range
+    )
+    select
+        r.created_at, r.source, r.country, r.city, r.platform, r.target, r.author, r.title, r.text,
+        r.url, r.sentiment, r.score, r.topic, r.lang, r.gender, r.age_range
+    from jsonb_populate_recordset(null::mentions, payload) r
+    on conflict (url) where url is not null do nothing;
+
+    get diagnostics inserted = row_count;
+    return inserted;
+end;
+$$;
+
+-- solo el backend (service role) inserta
+revoke execute on function bulk_insert_mentions(jsonb) from public, anon, authenticated;
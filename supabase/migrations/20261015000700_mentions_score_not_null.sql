@@ -0,0 +1,7 @@
+-- score siempre presente: la API suma it["score"] sin convertir ni atrapar errores.
+
+update mentions set score = 0 where score is null;
+
+alter table mentions
+    alter column score set default 0,
+    alter column score set not null;
@@ -0,0 +1,57 @@
+-- Rollup por hora para /trending con ventanas largas (>= 24h): en vez de agrupar
+-- días de mentions crudas, se suman unos cientos de buckets ya agregados.
+--
+-- Mismas reglas que la RPC trending: topic vacío/null -> 'otros',
+-- sentiment desconocido/null -> 'neu'. country/platform null -> '' para que
+-- el índice único (necesario para REFRESH CONCURRENTLY) no tenga NULLs.
+
+create materialized view if not exists mentions_hourly as
+select
+    date_trunc('hour', m.created_at) as bucket,
+    coalesce(m.country, '') as country,
+    coalesce(m.platform, '') as platform,
+    coalesce(nullif(trim(m.topic), ''), 'otros') as topic,
+    case when m.sentiment in ('pos', 'neg') then m.sentiment else 'neu' end as sentiment,
+    count(*)::int as cnt,
+    sum(m.score)::float8 as score_sum
+from mentions m
+group by 1, 2, 3, 4, 5;
+
+create unique index if not exists mentions_hourly_key
+    on mentions_hourly (bucket, country, platform, topic, sentiment);
+
+-- solo lo lee la RPC (y el backend)
+revoke all on mentions_hourly from anon, authenticated;
+
+-- refresco cada 5 min (los datos de /trending largos pueden ir hasta 5 min atrasados)
+create extension if not exists pg_cron;
+
+select cron.schedule(
+    'refresh-mentions-hourly',
+    '*/5 * * * *',
+    $$refresh materialized view concurrently mentions_hourly$$
+);
+
+-- Misma salida que trending(...). window_start se redondea a la hora (bucket).
+create or replace function trending_rollup(
+    window_start timestamptz,
+    p_country text default null,
+    p_platform text default null
+)
+returns table (topic text, count int, pos int, neu int, neg int, score_sum float8)
+language sql
+stable
+as $$
+    select
+        h.topic,
+        sum(h.cnt)::int as count,
+        (coalesce(sum(h.cnt) filter (where h.sentiment = 'pos'), 0))::int as pos,
+        (coalesce(sum(h.cnt) filter (where h.sentiment = 'neu'), 0))::int as neu,
+        (coalesce(sum(h.cnt) filter (where h.sentiment = 'neg'), 0))::int as neg,
+        sum(h.score_sum)::float8 as score_sum
+    from mentions_hourly h
+    where h.bucket >= date_trunc('hour', window_start)
+      and (p_country is null or h.country = p_country)
+      and (p_platform is null or h.platform = p_platform)
+    group by h.topic
+$$;
@@ -0,0 +1,43 @@
+-- /mentions sin "q": una sola RPC con todos los filtros como parámetros
+-- (null = sin filtro) en vez de encadenar un .eq() por filtro desde la API.
+--
+-- Es plpgsql con SQL dinámico: PostgREST pasa los argumentos como valores de
+-- runtime, así que un "p_x is null or col = p_x" nunca se simplifica y no usa
+-- índices. Acá el WHERE solo lleva los filtros presentes (col = $n) y EXECUTE
+-- planifica cada llamada con esa forma.
+
+create index if not exists mentions_country_platform_target_created_at
+    on mentions (country, platform, target, created_at desc);
+
+create or replace function list_mentions(
+    p_topic text default null,
+    p_sentiment text default null,
+    p_source text default null,
+    p_country text default null,
+    p_city text default null,
+    p_platform text default null,
+    p_target text default null,
+    p_since timestamptz default null,
+    p_limit int default 50
+)
+returns setof mentions
+language plpgsql
+stable
+as $$
+declare
+    sql text := 'select m.* from mentions m where true';
+begin
+    if p_topic is not null then sql := sql || ' and m.topic = $1'; end if;
+    if p_sentiment is not null then sql := sql || ' and m.sentiment = $2'; end if;
+    if p_source is not null then sql := sql || ' and m.source = $3'; end if;
+    if p_country is not null then sql := sql || ' and m.country = $4'; end if;
+    if p_city is not null then sql := sql || ' and m.city = $5'; end if;
+    if p_platform is not null then sql := sql || ' and m.platform = $6'; end if;
+    if p_target is not null then sql := sql || ' and m.target = $7'; end if;
+    if p_since is not null then sql := sql || ' and m.created_at >= $8'; end if;
+    sql := sql || ' order by m.created_at desc limit $9';
+
+    return query execute sql
+        using p_topic, p_sentiment, p_source, p_country, p_city, p_platform, p_target, p_since, p_limit;
+end
+$$;
@@ -0,0 +1,69 @@
+-- /search: "items" solo con las columnas pedidas (p_fields, null = todas).
+-- Por defecto la API no pide "text" (el campo más pesado), así el JSON que
+-- vuelve de PostgREST es mucho más chico.
+
+drop function if exists search_mentions_agg(text, timestamptz, text, text, text, text, int);
+
+create or replace function search_mentions_agg(
+    q text,
+    since timestamptz default null,
+    p_country text default null,
+    p_city text default null,
+    p_platform text default null,
+    p_source text default null,
+    lim int default 50,
+    p_fields text[] default null
+)
+returns table (total int, pos int, neu int, neg int, score_sum float8, items jsonb)
+language sql
+stable
+as $$
+    with fts as (
+        select m.*
+        from search_mentions(q, since) m
+        where q !~ '[%_*]'
+          and (p_country is null or m.country = p_country)
+          and (p_city is null or m.city = p_city)
+          and (p_platform is null or m.platform = p_platform)
+          and (p_source is null or m.source = p_source)
+        order by m.created_at desc
+        limit lim
+    ),
+    sub as (
+        select m.*
+        from search_mentions_substring(replace(lower(q), '*', '%'), since) m
+        where not exists (select 1 from fts)
+          and (p_country is null or m.country = p_country)
+          and (p_city is null or m.city = p_city)
+          and (p_platform is null or m.platform = p_platform)
+          and (p_source is null or m.source = p_source)
+        order by m.created_at desc
+        limit lim
+    ),
+    hits as (
+        select * from fts
+        union all
+        select * from sub
+    )
+    select
+        count(*)::int as total,
+        (count(*) filter (where h.sentiment = 'pos'))::int as pos,
+        (count(*) filter (where h.sentiment is null or h.sentiment not in ('pos', 'neg')))::int as neu,
+        (count(*) filter (where h.sentiment = 'neg'))::int as neg,
+        coalesce(sum(h.score), 0)::float8 as score_sum,
+        coalesce(
+            jsonb_agg(
+                case
+                    when p_fields is null then to_jsonb(h)
+                    else (
+                        select jsonb_object_agg(e.key, e.value)
+                        from jsonb_each(to_jsonb(h)) e
+                        where e.key = any(p_fields)
+                    )
+                end
+                order by h.created_at desc
+            ),
+            '[]'::jsonb
+        ) as items
+    from hits h
+$$;
@@ -0,0 +1,9 @@
+-- /mentions?target=X (list_mentions sin country/platform): el índice
+-- (country, platform, target, created_at) no sirve si no vienen los dos
+-- primeros. Este resuelve "target = X order by created_at desc limit N"
+-- recorriendo el índice en orden, sin sort.
+-- Parcial: las mentions sin target nunca se consultan por target.
+
+create index if not exists mentions_target_created_at
+    on mentions (target, created_at desc)
+    where target is not null;
@@ -0,0 +1,100 @@
+-- Regla única de búsqueda por texto, usada por /search (search_mentions_agg) y
+-- por text_search en la API (/mentions?q, /search/summary, /search/items):
+-- full-text primero; substring (pg_trgm) si "q" trae comodines (% _ *) o si
+-- full-text no encontró nada con esos filtros.
+--
+-- Sin order/limit adentro: los pone PostgREST (y el count=exact de
+-- /search/summary cuenta todos los matches, no solo los del limit).
+
+create or replace function search_mentions_hits(
+    q text,
+    since timestamptz default null,
+    p_topic text default null,
+    p_sentiment text default null,
+    p_source text default null,
+    p_country text default null,
+    p_city text default null,
+    p_platform text default null,
+    p_target text default null
+)
+returns setof mentions
+language sql
+stable
+as $$
+    with fts as (
+        select m.*
+        from search_mentions(q, since) m
+        where q !~ '[%_*]'
+          and (p_topic is null or m.topic = p_topic)
+          and (p_sentiment is null or m.sentiment = p_sentiment)
+          and (p_source is null or m.source = p_source)
+          and (p_country is null or m.country = p_country)
+          and (p_city is null or m.city = p_city)
+          and (p_platform is null or m.platform = p_platform)
+          and (p_target is null or m.target = p_target)
+    )
+    select * from fts
+    union all
+    select m.*
+    from search_mentions_substring(replace(lower(q), '*', '%'), since) m
+    where not exists (select 1 from fts)
+      and (p_topic is null or m.topic = p_topic)
+      and (p_sentiment is null or m.sentiment = p_sentiment)
+      and (p_source is null or m.source = p_source)
+      and (p_country is null or m.country = p_country)
+      and (p_city is null or m.city = p_city)
+      and (p_platform is null or m.platform = p_platform)
+      and (p_target is null or m.target = p_target)
+$$;
+
+-- search_mentions_agg ya no repite la regla: resume las "lim" más recientes
+-- de search_mentions_hits.
+create or replace function search_mentions_agg(
+    q text,
+    since timestamptz default null,
+    p_country text default null,
+    p_city text default null,
+    p_platform text default null,
+    p_source text default null,
+    lim int default 50,
+    p_fields text[] default null
+)
+returns table (total int, pos int, neu int, neg int, score_sum float8, items jsonb)
+language sql
+stable
+as $$
+    with hits as (
+        select m.*
+        from search_mentions_hits(
+            q,
+            since,
+            p_source => p_source,
+            p_country => p_country,
+            p_city => p_city,
+            p_platform => p_platform
+        ) m
+        order by m.created_at desc
+        limit lim
+    )
+    select
+        count(*)::int as total,
+        (count(*) filter (where h.sentiment = 'pos'))::int as pos,
+        (count(*) filter (where h.sentiment is null or h.sentiment not in ('pos', 'neg')))::int as neu,
+        (count(*) filter (where h.sentiment = 'neg'))::int as neg,
+        coalesce(sum(h.score), 0)::float8 as score_sum,
+        coalesce(
+            jsonb_agg(
+                case
+                    when p_fields is null then to_jsonb(h)
+                    else (
+                        select jsonb_object_agg(e.key, e.value)
+                        from jsonb_each(to_jsonb(h)) e
+                        where e.key = any(p_fields)
+                    )
+                end
+                order by h.created_at desc
+            ),
+            '[]'::jsonb
+        ) as items
+    from hits h
+$$;